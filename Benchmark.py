@@ -0,0 +1,159 @@
+from time import perf_counter
+from math import log
+from random import random
+import argparse
+import json
+import platform
+import tracemalloc
+
+import RandomTreesGeneration as rtg
+
+"""
+Benchmark dos geradores de árvores e dos algoritmos usados sobre elas.
+Cada caso tem um preparo, que não entra na medição (por exemplo, gerar a
+árvore cujo diâmetro será medido), e uma execução, que é medida. Para cada
+quantidade de vértices são registrados o tempo médio por execução e o pico
+de memória (medido com tracemalloc em uma execução separada, já que o
+tracemalloc deixa o código bem mais lento). Por fim, é ajustado o expoente
+empírico de crescimento: a inclinação da reta de mínimos quadrados de
+log(tempo) por log(n).
+Os resultados podem ser salvos em JSON e comparados com uma execução
+anterior, para acompanhar regressões e ganhos de desempenho.
+"""
+
+def grafoCompleto(n):
+    g = rtg.Grafo(n)
+    g.arestas = [[u, v, random()] for u in range(n) for v in range(u+1, n)]
+    return g
+
+def arvoreBFS(n):
+    return rtg.RandomTreeRandomWalk(n)
+
+PEQUENOS = [250, 500, 1000, 2000, 4000]
+GRANDES = [1000, 3000, 10000, 30000, 100000]
+
+"""
+Cada caso é (nome, preparo, execução, tamanhos, lote). As funções sobre
+grafos completos materializam n(n-1)/2 arestas, então ficam em n <= 4000;
+as demais vão até 10^5. Nos casos em lote (NumPy), cada execução gera ou
+processa "lote" árvores, e o tempo registrado é por árvore.
+"""
+
+CASOS = [
+    ("RandomTreeRandomWalk", lambda n: n, rtg.RandomTreeRandomWalk, GRANDES, 1),
+    ("RandomTreeKruskal", lambda n: n, rtg.RandomTreeKruskal, PEQUENOS, 1),
+    ("MSTKruskal", grafoCompleto, lambda g: g.MSTKruskal(), PEQUENOS, 1),
+    ("MSTFilterKruskal", grafoCompleto, lambda g: g.MSTFilterKruskal(), PEQUENOS, 1),
+    ("Diametro", arvoreBFS, lambda T: T.Diametro(), GRANDES, 1),
+]
+
+if rtg.np is not None:
+    CASOS += [
+        ("random_walk_trees", lambda n: n, lambda n: rtg.random_walk_trees(n, 100), GRANDES, 100),
+        ("kruskal_trees", lambda n: n, lambda n: rtg.kruskal_trees(n, 10), PEQUENOS, 10),
+        ("diametros", lambda n: rtg.random_walk_trees(n, 100), rtg.diametros, GRANDES, 100),
+    ]
+
+def mede(preparo, execucao, n, repeticoes, lote):
+    tempo = 0.0
+    for _ in range(repeticoes):
+        entrada = preparo(n)
+        inicio = perf_counter()
+        execucao(entrada)
+        tempo += perf_counter() - inicio
+    entrada = preparo(n)
+    tracemalloc.start()
+    execucao(entrada)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tempo / (repeticoes * lote), pico
+
+def ajustaExpoente(tamanhos, tempos):
+    """
+    Inclinação da reta de mínimos quadrados de log(tempo) por log(n).
+    """
+    xs = [log(n) for n in tamanhos]
+    ys = [log(t) for t in tempos]
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    sxx = sum((x - mx) ** 2 for x in xs)
+    if sxx == 0:
+        return None
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+
+def executa(casos=None, limite=None, repeticoes=3):
+    resultados = {}
+    for nome, preparo, execucao, tamanhos, lote in CASOS:
+        if casos and nome not in casos:
+            continue
+        tamanhos = [n for n in tamanhos if limite is None or n <= limite]
+        tempos = []
+        memoria = []
+        for n in tamanhos:
+            tempo, pico = mede(preparo, execucao, n, repeticoes, lote)
+            tempos.append(tempo)
+            memoria.append(pico)
+            print(f"{nome} n={n}: {tempo:.6f}s por árvore, pico de {pico / 2**20:.2f} MiB")
+        resultados[nome] = {
+            "tamanhos": tamanhos,
+            "tempos": tempos,
+            "memoria": memoria,
+            "expoente": ajustaExpoente(tamanhos, tempos) if len(tamanhos) > 1 else None,
+        }
+    return {
+        "maquina": platform.platform(),
+        "processador": platform.processor(),
+        "python": platform.python_version(),
+        "repeticoes": repeticoes,
+        "casos": resultados,
+    }
+
+def compara(atual, base):
+    """
+    Compara duas execuções caso a caso, para os tamanhos medidos nas duas.
+    Razões maiores que 1 indicam que a execução atual ficou mais lenta.
+    """
+    linhas = []
+    for nome, caso in atual["casos"].items():
+        if nome not in base["casos"]:
+            continue
+        anterior = base["casos"][nome]
+        tempos = dict(zip(anterior["tamanhos"], anterior["tempos"]))
+        for n, t in zip(caso["tamanhos"], caso["tempos"]):
+            if n in tempos:
+                linhas.append((nome, n, t / tempos[n]))
+        if caso["expoente"] is not None and anterior["expoente"] is not None:
+            print(f"{nome}: expoente {anterior['expoente']:.2f} -> {caso['expoente']:.2f}")
+    for nome, n, razao in linhas:
+        print(f"{nome} n={n}: {razao:.2f}x o tempo da base")
+    return linhas
+
+"""
+Teste do ajuste do expoente: para tempos que crescem exatamente como
+n^2, a inclinação encontrada deve ser 2.
+"""
+
+def testeAjustaExpoente():
+    tamanhos = [10, 100, 1000]
+    assert abs(ajustaExpoente(tamanhos, [3 * n ** 2 for n in tamanhos]) - 2) < 1e-9
+    assert ajustaExpoente([5, 5], [1, 2]) is None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos geradores de árvores")
+    parser.add_argument("--casos", nargs="*", help="nomes dos casos a executar")
+    parser.add_argument("--limite", type=int, help="maior quantidade de vértices")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--salva", help="arquivo JSON onde salvar os resultados")
+    parser.add_argument("--compara", help="arquivo JSON de uma execução anterior")
+    args = parser.parse_args()
+    testeAjustaExpoente()
+    resultados = executa(args.casos, args.limite, args.repeticoes)
+    if args.salva:
+        with open(args.salva, "w") as file:
+            json.dump(resultados, file, indent=2)
+    if args.compara:
+        with open(args.compara) as file:
+            compara(resultados, json.load(file))
+
+if __name__ == '__main__':
+    main()
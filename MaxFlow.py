@@ -1,5 +1,5 @@
-from collections import deque
 import random
+import NucleoGrafo
 
 class Rede:
     def __init__(self, num_vertices, fonte, sumidouro):
@@ -26,6 +26,22 @@ class Rede:
             res += f'({u}, {v}): {c}\n'
         return res
 
+    def compacta(self):
+        '''
+        Constrói a representação compacta (CSR do NucleoGrafo)
+        da rede, usada pelas buscas. Cada par (u, v) do dicionário
+        de capacidades vira uma aresta numerada, na ordem do
+        dicionário, que é a mesma ordem das listas de adjacências;
+        idaresta guarda o número de cada par e cap as capacidades
+        indexadas por esse número.
+        '''
+        arestas = list(self.capacidade)
+        self.idaresta = {aresta: e for e, aresta in enumerate(arestas)}
+        self.cap = [self.capacidade[aresta] for aresta in arestas]
+        self.nucleo = NucleoGrafo.GrafoCompacto(self.num, [u for u, _ in arestas],
+                                                [v for _, v in arestas])
+        return self.nucleo
+
 
 
 def calcula_fluxos(rede, fluxo):
@@ -313,33 +329,38 @@ def encontrar_caminho(rede_residual, pai):
     é utilizar o BFS para encontrar este caminho visitando
     todos os nós em ordem crescente de distância da fonte,
     garantindo que o caminho encontrado seja o mais curto
-    possível.
+    possível. A busca é a BFS do NucleoGrafo sobre a
+    representação compacta da rede, ignorando arestas
+    sem capacidade e parando ao chegar no sumidouro.
     '''
 
-    visitados = [False] * rede_residual.num
-    visitados[rede_residual.s] = True
-    Q = deque()
-    Q.append(rede_residual.s)
-
-    while Q:
-        u = Q.popleft()
-        for v in rede_residual.G[u]:
-            if not visitados[v] and rede_residual.capacidade[(u, v)] > 0:
-                pai[v] = u
-                visitados[v] = True
-                Q.append(v)
+    g = rede_residual.compacta()
+    dist = NucleoGrafo.buffer(g.n)
+    paiaresta = NucleoGrafo.buffer(g.n)
+    fila = NucleoGrafo.buffer(g.n)
+    quantidade = NucleoGrafo.bfs(g, rede_residual.s, dist, paiaresta, fila,
+                                 capacidade=rede_residual.cap, alvo=rede_residual.t)
+    for i in range(1, quantidade):
+        pai[fila[i]] = g.origem[paiaresta[fila[i]]]
 
-                if v == rede_residual.t:
-                    caminho = []
-                    while v != rede_residual.s:
-                        caminho.append(v)
-                        v = pai[v]
+    if dist[rede_residual.t] < 0:
+        return None
+    return monta_caminho(rede_residual.s, rede_residual.t, pai)
 
-                    caminho.append(rede_residual.s)
-                    caminho.reverse()
-                    return caminho
+def monta_caminho(s, t, pai):
+    '''
+    Reconstrói o caminho de s até t seguindo os pais
+    encontrados pela busca.
+    '''
+    caminho = []
+    v = t
+    while v != s:
+        caminho.append(v)
+        v = pai[v]
 
-    return None
+    caminho.append(s)
+    caminho.reverse()
+    return caminho
 
 def teste_encontrar_caminho():
     '''
@@ -365,6 +386,26 @@ def teste_encontrar_caminho():
 
     assert encontrar_caminho(res, pai=[-1] * res.num) == [s, v1, v3, t]
 
+def teste_DFS_invertido():
+    '''
+    Função para testar o DFS invertido: a partir do
+    sumidouro, devem ser marcados exatamente os vértices
+    que alcançam o sumidouro por arestas da rede.
+    '''
+    s, v1, v2, v3, t = list(range(5))
+
+    rede = cria_rede(5, s, t)
+
+    addAresta(rede, s, v1, 3)
+    addAresta(rede, v1, t, 2)
+    addAresta(rede, v3, v1, 4)
+    addAresta(rede, s, v2, 5)
+
+    visitados = [False] * rede.num
+    DFS_invertido(rede, t, visitados)
+
+    assert visitados == [True, True, False, True, True]
+
 def EdmondsKarp(rede):
     '''
     O algoritmo de Edmonds Karp é nada mais que uma
@@ -401,37 +442,61 @@ def EdmondsKarp(rede):
     continua a encontrar caminhos aumentantes e adicionar fluxo
     até que não haja mais caminhos aumentantes. Nesse ponto,
     o fluxo máximo é encontrado e o algoritmo termina.
+    A rede residual é compactada uma única vez: as buscas
+    reaproveitam os mesmos buffers e as capacidades são
+    atualizadas no array cap, indexado pelo número da
+    aresta, e copiadas de volta para o dicionário no fim.
     '''
     fluxo_total = 0
     residual = cria_rede_residual(rede, fluxo={})
     fluxoEK = {}
 
-    while True:
-        pai = [-1] * residual.num
+    g = residual.compacta()
+    cap = residual.cap
+    '''
+    A rede residual não tem a aresta (u, v) quando sua
+    capacidade residual é 0, mas pode ter a reversa (v, u).
+    Uma aresta sem reversa fica marcada com -1, e a
+    capacidade da reversa só é atualizada quando ela existe
+    (sem isso, cap[-1] alteraria a última aresta).
+    '''
+    reversa = [residual.idaresta.get((v, u), -1) for u, v in residual.idaresta]
+    dist = NucleoGrafo.buffer(g.n)
+    paiaresta = NucleoGrafo.buffer(g.n)
+    fila = NucleoGrafo.buffer(g.n)
 
-        caminho = encontrar_caminho(residual, pai)
-        if caminho == None:
+    while True:
+        quantidade = NucleoGrafo.bfs(g, residual.s, dist, paiaresta, fila,
+                                     capacidade=cap, alvo=residual.t)
+        encontrado = dist[residual.t] >= 0
+        NucleoGrafo.limpa(dist, fila, quantidade)
+        if not encontrado:
             #print("Nenhum caminho encontrado")
             break
-        print("Caminho encontrado:", caminho)
-        caminho_min = float("Inf")
-        s = residual.t
-        while s != residual.s:
-            caminho_min = min(caminho_min, residual.capacidade[(pai[s], s)])
-            s = pai[s]
+        caminho = []
+        v = residual.t
+        while v != residual.s:
+            caminho.append(paiaresta[v])
+            v = g.origem[paiaresta[v]]
+        caminho.reverse()
+        print("Caminho encontrado:", [residual.s] + [g.destino[e] for e in caminho])
+        caminho_min = min(cap[e] for e in caminho)
 
         fluxo_total += caminho_min
 
-        v = residual.t
-        while v != residual.s:
-            u = pai[v]
+        for e in caminho:
+            u = g.origem[e]
+            v = g.destino[e]
             fluxo_aresta = caminho_min
             if (u, v) in fluxoEK:
                 fluxo_aresta += fluxoEK[(u, v)]
             fluxoEK[(u, v)] = fluxo_aresta
-            residual.capacidade[(u, v)] -= caminho_min
-            residual.capacidade[(v, u)] += caminho_min
-            v = pai[v]
+            cap[e] -= caminho_min
+            if reversa[e] >= 0:
+                cap[reversa[e]] += caminho_min
+
+    for aresta, e in residual.idaresta.items():
+        residual.capacidade[aresta] = cap[e]
 
     assert verifica_fluxo(rede, fluxoEK) == True
 
@@ -447,11 +512,9 @@ def DFS(rede, u, visitados):
     Após fazer o DFS começando pela fonte, se algum
     vértice não foi visitado, é adicionada uma aresta
     entre a fonte e este vértice.
+    A busca é a DFS iterativa do NucleoGrafo.
     '''
-    for v in rede.G[u]:
-        if (u, v) in rede.capacidade and not visitados[v]:
-            visitados[v] = True
-            DFS(rede, v, visitados)
+    NucleoGrafo.dfs(rede.compacta(), u, visitados)
 
 def DFS_invertido(rede, u, visitados):
     '''
@@ -463,12 +526,14 @@ def DFS_invertido(rede, u, visitados):
     seguinte maneira: Após fazer o DFS começando
     pelo sumidouro, se algum vértice não foi visitado,
     é adicionada uma aresta entre o sumidouro e este
-    vértice.
+    vértice. A busca é a DFS do NucleoGrafo sobre a
+    rede com todas as arestas invertidas, de forma que
+    os vértices marcados são os que alcançam u.
     '''
-    for v in (rede.G[u]):
-        if (v, u) in rede.capacidade and not visitados[u]:
-            visitados[u] = True
-            DFS_invertido(rede, u, visitados)
+    arestas = list(rede.capacidade)
+    invertida = NucleoGrafo.GrafoCompacto(rede.num, [v for _, v in arestas],
+                                          [u for u, _ in arestas])
+    NucleoGrafo.dfs(invertida, u, visitados)
 
 def rede_aleatoria_valida():
     '''
@@ -542,6 +607,16 @@ def Etapa3():
     '''
     assert EdmondsKarp(rede) == 23
 
+    '''
+    Uma aresta de capacidade 0 não entra na rede residual,
+    apenas a sua reversa (também com capacidade 0).
+    '''
+    rede = cria_rede(3, 0, 2)
+    addAresta(rede, 0, 1, 5)
+    addAresta(rede, 1, 2, 5)
+    addAresta(rede, 0, 2, 0)
+    assert EdmondsKarp(rede) == 5
+
     '''
     É possível testar o algoritmo de Edmonds-Karp
     para entradas aleatórias também. Dentro da
@@ -560,6 +635,7 @@ def Etapa3():
 def main():
     teste_calcula_fluxos()
     teste_encontrar_caminho()
+    teste_DFS_invertido()
     Etapa1()
     Etapa2()
     Etapa3()
@@ -0,0 +1,200 @@
+from array import array
+
+"""
+Núcleo compacto de grafos usado tanto pela Rede (MaxFlow.py) quanto pelo
+Grafo (RandomTreesGeneration.py). O grafo é guardado em arrays de inteiros
+no formato CSR (compressed sparse row): as arestas saindo do vértice u
+ocupam as posições inicio[u] até inicio[u+1]-1 de vizinho (o outro vértice)
+e de aresta (o número da aresta, que indexa origem, destino e qualquer
+array de atributos do chamador, como capacidades).
+A BFS e a DFS são iterativas e escrevem em buffers passados pelo chamador,
+de forma que os mesmos buffers podem ser reaproveitados entre buscas.
+"""
+
+class GrafoCompacto:
+    def __init__(self, n: int, origem, destino, nao_orientado: bool = False) -> None:
+        """
+        Constrói o CSR a partir dos arrays de origens e destinos das
+        arestas, por contagem. As arestas de cada vértice ficam na ordem
+        em que aparecem nos arrays. Com nao_orientado, cada aresta
+        aparece nas listas dos seus dois vértices.
+        """
+        self.n = n
+        self.m = len(origem)
+        self.origem = array("l", origem)
+        self.destino = array("l", destino)
+        self.nao_orientado = nao_orientado
+        grau = buffer(n + 1, 0)
+        for u in self.origem:
+            grau[u + 1] += 1
+        if nao_orientado:
+            for v in self.destino:
+                grau[v + 1] += 1
+        for u in range(n):
+            grau[u + 1] += grau[u]
+        self.inicio = array("l", grau)
+        posicoes = 2 * self.m if nao_orientado else self.m
+        self.vizinho = buffer(posicoes, 0)
+        self.aresta = buffer(posicoes, 0)
+        proxima = grau
+        for e in range(self.m):
+            u = self.origem[e]
+            v = self.destino[e]
+            k = proxima[u]
+            self.vizinho[k] = v
+            self.aresta[k] = e
+            proxima[u] = k + 1
+            if nao_orientado:
+                k = proxima[v]
+                self.vizinho[k] = u
+                self.aresta[k] = e
+                proxima[v] = k + 1
+
+    @classmethod
+    def deCSR(cls, inicio, vizinho, origem):
+        """
+        Monta o grafo direto dos arrays do CSR, sem passar pela contagem.
+        Cada posição k de vizinho é um arco numerado por k, de origem[k]
+        para vizinho[k]; um grafo não-orientado já tem os dois arcos de
+        cada aresta. Como o número do arco é a própria posição, aresta
+        é apenas um range. As listas recebidas são guardadas sem cópia: no
+        laço da BFS, indexar listas do Python é mais rápido que arrays.
+        """
+        g = cls.__new__(cls)
+        g.n = len(inicio) - 1
+        g.m = len(vizinho)
+        g.nao_orientado = False
+        g.inicio = inicio
+        g.vizinho = vizinho
+        g.destino = vizinho
+        g.origem = origem
+        g.aresta = range(g.m)
+        return g
+
+    def outro(self, e, v):
+        """
+        O outro vértice da aresta e, vista a partir de v.
+        """
+        return self.origem[e] ^ self.destino[e] ^ v
+
+def buffer(n, valor=-1):
+    return array("l", [valor]) * n
+
+"""
+bfs percorre o grafo em largura a partir de s. dist deve vir preenchido
+com -1 (valor de não visitado); ao final, dist[v] é a distância de s até v
+para os vértices alcançados. Se paiaresta for passado, paiaresta[v] recebe
+a aresta pela qual v foi descoberto. Os vértices visitados são escritos em
+fila, na ordem da busca, e a quantidade deles é retornada, então o último
+vértice visitado (o mais distante de s) é fila[quantidade-1].
+Com capacidade, arestas e com capacidade[e] <= 0 são ignoradas; com alvo,
+a busca para assim que o alvo é descoberto.
+"""
+
+def bfs(g, s, dist, paiaresta=None, fila=None, capacidade=None, alvo=-1):
+    if fila is None:
+        fila = buffer(g.n)
+    inicio = g.inicio
+    vizinho = g.vizinho
+    aresta = g.aresta
+    dist[s] = 0
+    fila[0] = s
+    frente = 0
+    fim = 1
+    while frente < fim:
+        u = fila[frente]
+        frente += 1
+        du = dist[u] + 1
+        for k in range(inicio[u], inicio[u + 1]):
+            v = vizinho[k]
+            if dist[v] < 0:
+                if capacidade is not None and capacidade[aresta[k]] <= 0:
+                    continue
+                dist[v] = du
+                if paiaresta is not None:
+                    paiaresta[v] = aresta[k]
+                fila[fim] = v
+                fim += 1
+                if v == alvo:
+                    return fim
+    return fim
+
+def limpa(dist, fila, quantidade, valor=-1):
+    """
+    Devolve ao valor inicial apenas as posições de dist tocadas por uma
+    busca que visitou fila[0:quantidade], para reaproveitar o buffer.
+    """
+    for i in range(quantidade):
+        dist[fila[i]] = valor
+
+"""
+dfs percorre o grafo em profundidade a partir de s, marcando em visitados
+(um bytearray ou lista de booleanos) os vértices alcançados. Vértices já
+marcados pelo chamador não são percorridos. Retorna quantos vértices foram
+marcados pela busca.
+"""
+
+def dfs(g, s, visitados, pilha=None, capacidade=None):
+    if pilha is None:
+        pilha = []
+    inicio = g.inicio
+    vizinho = g.vizinho
+    aresta = g.aresta
+    marcados = 0
+    if not visitados[s]:
+        visitados[s] = True
+        marcados = 1
+    pilha.append(s)
+    while pilha:
+        u = pilha.pop()
+        for k in range(inicio[u], inicio[u + 1]):
+            v = vizinho[k]
+            if not visitados[v]:
+                if capacidade is not None and capacidade[aresta[k]] <= 0:
+                    continue
+                visitados[v] = True
+                marcados += 1
+                pilha.append(v)
+    return marcados
+
+"""
+Testes do núcleo: a BFS deve encontrar as distâncias e os pais corretos,
+parar no alvo e respeitar capacidades; a DFS deve marcar exatamente os
+vértices alcançáveis.
+"""
+
+def testeNucleo():
+    g = GrafoCompacto(6, [0, 0, 1, 2, 4], [1, 2, 3, 3, 5])
+    dist = buffer(6)
+    pai = buffer(6)
+    fila = buffer(6)
+    quantidade = bfs(g, 0, dist, pai, fila)
+    assert quantidade == 4
+    assert list(dist) == [0, 1, 1, 2, -1, -1]
+    assert g.origem[pai[3]] == 1
+    limpa(dist, fila, quantidade)
+    assert list(dist) == [-1] * 6
+    assert bfs(g, 0, dist, fila=fila, alvo=1) == 2
+    dist = buffer(6)
+    assert bfs(g, 0, dist, capacidade=[0, 1, 1, 1, 1]) == 3 and dist[1] == -1
+    h = GrafoCompacto(6, [0, 0, 1, 2, 4], [1, 2, 3, 3, 5], nao_orientado=True)
+    dist = buffer(6)
+    assert bfs(h, 3, dist) == 4 and dist[0] == 2
+    assert h.outro(2, 3) == 1
+    visitados = bytearray(6)
+    assert dfs(h, 5, visitados) == 2
+    assert list(visitados) == [0, 0, 0, 0, 1, 1]
+    a = GrafoCompacto.deCSR([0, 2, 4, 6, 9, 11, 12],
+                            [1, 2, 0, 3, 0, 3, 1, 2, 4, 3, 5, 4],
+                            [0, 0, 1, 1, 2, 2, 3, 3, 3, 4, 4, 5])
+    dist = buffer(6)
+    pai = buffer(6)
+    assert bfs(a, 0, dist, pai) == 6 and list(dist) == [0, 1, 1, 2, 3, 4]
+    assert a.outro(pai[5], 5) == 4 and a.outro(pai[3], 3) == 1
+    visitados = [False] * 6
+    visitados[1] = True
+    assert dfs(g, 0, visitados) == 3
+    assert visitados == [True, True, True, True, False, False]
+
+if __name__ == '__main__':
+    testeNucleo()
@@ -1,10 +1,31 @@
 from typing import List
-from collections import deque
 from time import time
+import os
 from math import inf
+from math import sqrt
 from random import choice
 from random import random
+from random import sample
+from itertools import islice
+from itertools import accumulate
 from operator import itemgetter
+import NucleoGrafo
+import struct
+import json
+import sys
+from contextlib import contextmanager
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def exigeNumpy(nome):
+    if np is None:
+        raise ImportError("%s precisa do NumPy, que não está instalado" % nome)
 
 class Vertice:
     def __init__(self, num: int) -> None:
@@ -25,7 +46,8 @@ class Grafo:
     """
     Representação de um grafo não-orientado
     """
-    def __init__(self, n: int) -> None:
+    def __init__(self, n: int, diametro_incremental: bool = False,
+                 componentes_incremental: bool = False) -> None:
         """
         Atributos do grafo
         """
@@ -36,37 +58,204 @@ class Grafo:
         Neste grafo temos uma matriz de adjacências para armazenar
         os pesos das arestas adicionadas ao grafo.
         """
+        self.diametro_incremental = diametro_incremental
+        if diametro_incremental:
+            self.iniciaDiametroIncremental()
+        self.componentes_incremental = componentes_incremental
+        if componentes_incremental:
+            self.iniciaComponentes()
+        self.nucleo = None
+
     def addArestas(self, u: int, v: int, w):
+        """
+        Retorna True se, no modo de componentes incremental, a aresta
+        adicionada fechou um ciclo.
+        """
         self.vertices[u].adj.append(self.vertices[v])
         self.vertices[v].adj.append(self.vertices[u])
         self.arestas.append([u, v, w])
         self.quantidadearestas += 1
+        self.nucleo = None
+        if self.diametro_incremental:
+            self.atualizaDiametro(u, v)
+        if self.componentes_incremental:
+            return self.uneComponentes(u, v)
+        return False
+
+    """
+    Modo de componentes incremental. O grafo mantém uma estrutura de conjuntos
+    disjuntos (union-find com união por rank e compressão de caminho) sobre os
+    números dos vértices, atualizada a cada addArestas. Uma aresta cujos dois
+    vértices já estão no mesmo conjunto fecha um ciclo e é contada em
+    quantidadeciclos; caso contrário, os conjuntos são unidos e a quantidade
+    de componentes diminui. Assim, is_arvore(), quantidadeComponentes(),
+    is_conexo() e conectados() não precisam percorrer o grafo.
+    """
+
+    def iniciaComponentes(self):
+        n = len(self.vertices)
+        self.paicomponente = list(range(n))
+        self.rankcomponente = [0] * n
+        self.componentes = n
+        self.quantidadeciclos = 0
+
+    def encontraComponente(self, u):
+        pai = self.paicomponente
+        raiz = u
+        while pai[raiz] != raiz:
+            raiz = pai[raiz]
+        while pai[u] != raiz:
+            pai[u], u = raiz, pai[u]
+        return raiz
+
+    def uneComponentes(self, u, v):
+        ru = self.encontraComponente(u)
+        rv = self.encontraComponente(v)
+        if ru == rv:
+            self.quantidadeciclos += 1
+            return True
+        if self.rankcomponente[ru] > self.rankcomponente[rv]:
+            self.paicomponente[rv] = ru
+        else:
+            self.paicomponente[ru] = rv
+            if self.rankcomponente[ru] == self.rankcomponente[rv]:
+                self.rankcomponente[rv] += 1
+        self.componentes -= 1
+        return False
+
+    def quantidadeComponentes(self):
+        if self.componentes_incremental:
+            return self.componentes
+        g = self.compacta()
+        visitados = bytearray(g.n)
+        pilha = []
+        componentes = 0
+        for v in range(g.n):
+            if not visitados[v]:
+                NucleoGrafo.dfs(g, v, visitados, pilha)
+                componentes += 1
+        return componentes
+
+    def is_conexo(self):
+        return self.quantidadeComponentes() <= 1
+
+    def conectados(self, u, v):
+        if self.componentes_incremental:
+            return self.encontraComponente(u) == self.encontraComponente(v)
+        g = self.compacta()
+        visitados = bytearray(g.n)
+        NucleoGrafo.dfs(g, u, visitados)
+        return bool(visitados[v])
+
+    """
+    Modo de diâmetro incremental. Quando a árvore é construída adicionando
+    uma folha nova por aresta (como no RandomTreeRandomWalk), o diâmetro pode
+    ser mantido durante a construção: se (a, b) são as pontas do diâmetro
+    atual e x é a folha nova, o novo diâmetro é o maior entre d(a, b),
+    d(x, a) e d(x, b). As distâncias são calculadas com o menor ancestral
+    comum (LCA) por binary lifting: ancestral[k][x] guarda o ancestral 2^k
+    níveis acima de x, de forma que cada inserção e cada consulta de
+    distância custam O(log n).
+    Se alguma aresta não ligar um vértice da árvore a um vértice novo,
+    o modo é desligado e Diametro() volta a usar os dois BFS.
+    """
+
+    def iniciaDiametroIncremental(self):
+        n = len(self.vertices)
+        self.log = max(1, n.bit_length())
+        self.ancestral = [[0] * n for _ in range(self.log)]
+        self.profundidade = [-1] * n
+        self.pontas = None
+        self.diametro = 0
+
+    def insereFolha(self, x, p):
+        self.profundidade[x] = self.profundidade[p] + 1
+        self.ancestral[0][x] = p
+        for k in range(1, self.log):
+            self.ancestral[k][x] = self.ancestral[k-1][self.ancestral[k-1][x]]
+
+    def LCA(self, u, v):
+        if self.profundidade[u] < self.profundidade[v]:
+            u, v = v, u
+        diferenca = self.profundidade[u] - self.profundidade[v]
+        k = 0
+        while diferenca:
+            if diferenca & 1:
+                u = self.ancestral[k][u]
+            diferenca >>= 1
+            k += 1
+        if u == v:
+            return u
+        for k in range(self.log - 1, -1, -1):
+            if self.ancestral[k][u] != self.ancestral[k][v]:
+                u = self.ancestral[k][u]
+                v = self.ancestral[k][v]
+        return self.ancestral[0][u]
+
+    def distancia(self, u, v):
+        return self.profundidade[u] + self.profundidade[v] - 2 * self.profundidade[self.LCA(u, v)]
+
+    def atualizaDiametro(self, u, v):
+        if self.pontas is None:
+            self.profundidade[u] = 0
+            for k in range(self.log):
+                self.ancestral[k][u] = u
+            self.pontas = (u, u)
+        if self.profundidade[u] < 0:
+            u, v = v, u
+        if self.profundidade[u] < 0 or self.profundidade[v] >= 0:
+            self.diametro_incremental = False
+            return
+        self.insereFolha(v, u)
+        a, b = self.pontas
+        da = self.distancia(v, a)
+        db = self.distancia(v, b)
+        if da >= db and da > self.diametro:
+            self.pontas = (a, v)
+            self.diametro = da
+        elif db > self.diametro:
+            self.pontas = (v, b)
+            self.diametro = db
 
     """
     O BFS foi implementado para que possa ser chamado na função Diametro().
     Em Diametro(), o BFS aqui é utilizado para encontrar o vértice que está 
     mais longe da raíz do grafo e também calcula esta distância.
+    As buscas são feitas pelo NucleoGrafo, sobre uma cópia compacta (CSR) das
+    listas de adjacências dos vértices, construída por compacta() na primeira
+    busca e descartada por addArestas. As listas adj, e não a lista arestas
+    (que MSTKruskal e RandomTreeKruskal substituem diretamente), são o que
+    define o grafo percorrido. Os buffers de distância e da fila são
+    guardados no grafo e reaproveitados entre as buscas. maisDistante
+    retorna também quantos vértices a busca alcançou, o que permite ao
+    Diametro() verificar a conexidade sem uma busca a mais.
     """
 
+    def compacta(self):
+        if self.nucleo is None:
+            n = len(self.vertices)
+            inicio = [0]
+            inicio += accumulate(len(v.adj) for v in self.vertices)
+            vizinho = [w.num for v in self.vertices for w in v.adj]
+            origem = [v.num for v in self.vertices for _ in v.adj]
+            self.nucleo = NucleoGrafo.GrafoCompacto.deCSR(inicio, vizinho, origem)
+            self.dist = [-1] * n
+            self.fila = [-1] * n
+        return self.nucleo
+
+    def maisDistante(self, s):
+        g = self.compacta()
+        quantidade = NucleoGrafo.bfs(g, s, self.dist, fila=self.fila)
+        res = self.fila[quantidade - 1]
+        d = self.dist[res]
+        NucleoGrafo.limpa(self.dist, self.fila, quantidade)
+        if PERFIL is not None:
+            PERFIL.conta("bfs.expansoes", quantidade)
+        return res, d, quantidade
+
     def BFS(self, s):
-        fila = deque()
-        for v in self.vertices:
-            v.d = inf
-            v.visitado = False
-        self.vertices[s].d = 0
-        self.vertices[s].visitado = True
-        fila.appendleft(self.vertices[s])
-        while fila:
-            u = fila.popleft()
-            res = u.num
-            for v in u.adj:
-                if v.visitado == False:
-                    v.d = u.d + 1
-                    fila.append(v)
-                    v.visitado = True
-        for v in self.vertices:
-            if v.num == res:
-                return v.num, v.d  # Retorna o Vértice mais distante e sua distância
+        res, d, _ = self.maisDistante(s)
+        return res, d  # Retorna o Vértice mais distante e sua distância
 
 
     """
@@ -88,32 +277,172 @@ class Grafo:
     não-alcançáveis em um grafo. Assim, por fim, basta verificar se o set visitados possui
     o mesmo número de elementos da lista de vértices do grafo. Caso algum vértice não 
     tenha sido visitado, este grafo não é uma árvore, já que um vértice não pôde ser acessado.
+    O DFS (do NucleoGrafo) usa uma pilha explícita, para não atingir o limite de recursão
+    em grafos grandes, e is_arvore usa diretamente a quantidade de vértices marcados.
+    No modo de componentes incremental, a busca nem é necessária: com n-1 arestas,
+    o grafo é uma árvore se e somente se tem uma única componente.
+    Diametro() não chama is_arvore(): o primeiro BFS já diz quantos vértices
+    são alcançáveis, então com n-1 arestas basta conferir que ele alcançou
+    todos os n vértices.
     """
 
     def DFS(self, s, visitados):
-        visitados.add(s)
-        for u in self.vertices[s].adj:
-            if u.num not in visitados:
-                self.DFS(u.num, visitados)
+        g = self.compacta()
+        marcados = bytearray(g.n)
+        NucleoGrafo.dfs(g, s, marcados)
+        visitados.update(v for v in range(g.n) if marcados[v])
 
     def is_arvore(self):
         if self.quantidadearestas != (len(self.vertices)-1):
             #print("\nO grafo não é uma árvore, portanto não pode ter o diâmetro medido")
             return False
-        visitados = set()
+        if self.componentes_incremental:
+            return self.componentes == 1
+        g = self.compacta()
         s = choice(self.vertices)
-        self.DFS(s.num, visitados)
-        return len(visitados) == len(self.vertices)
+        return NucleoGrafo.dfs(g, s.num, bytearray(g.n)) == g.n
 
     def Diametro(self):
-        if not self.is_arvore():
+        if self.diametro_incremental and self.quantidadearestas == len(self.vertices) - 1:
+            return self.diametro
+        n = len(self.vertices)
+        if self.quantidadearestas != n - 1:
+            return
+        if self.componentes_incremental and self.componentes != 1:
             return
         s = choice(self.vertices)
-        a, d1 = self.BFS(s.num)
+        a, d1, alcancados = self.maisDistante(s.num)
+        if alcancados != n:
+            return
         b, d2 = self.BFS(a)
         #print("\nO diâmetro da árvore é %d" % d2)
         return d2
 
+    """
+    Diametro() só vale para árvores. Para grafos não-orientados quaisquer (sem
+    pesos), Excentricidades() usa a técnica de limitação de excentricidades
+    (BoundingDiameters, de Takes e Kosters). Cada vértice w
+    guarda limites inferior[w] <= ecc(w) <= superior[w]. Um BFS a partir de v
+    dá ecc(v) e as distâncias d(v, w), e pela desigualdade triangular
+        max(d(v, w), ecc(v) - d(v, w)) <= ecc(w) <= ecc(v) + d(v, w).
+    Os BFS alternam entre o candidato de maior limite superior (provavelmente
+    periférico, aumenta o limite inferior do diâmetro) e o de menor limite
+    inferior (provavelmente central, reduz os limites superiores).
+    Um vértice deixa de ser candidato quando os seus dois limites se
+    encontram. Em grafos esparsos reais isso costuma exigir poucos BFS em vez
+    de um por vértice.
+    Em um grafo desconexo todas as excentricidades (e o diâmetro) são inf.
+    Excentricidades(maximobfs) pode parar antes, depois de maximobfs buscas,
+    e retorna as listas de limites inferiores e superiores; quando não há
+    limite, os dois são iguais às excentricidades exatas.
+    """
+
+    def Excentricidades(self, maximobfs=None):
+        g = self.compacta()
+        n = g.n
+        inferior = [0] * n
+        superior = [inf] * n
+        if n == 0:
+            return inferior, superior
+        dist = self.dist
+        fila = self.fila
+        candidatos = list(range(n))
+        buscas = 0
+        periferico = True
+        while candidatos and (maximobfs is None or buscas < maximobfs):
+            if periferico:
+                v = max(candidatos, key=lambda w: (superior[w], len(self.vertices[w].adj)))
+            else:
+                v = min(candidatos, key=lambda w: (inferior[w], -len(self.vertices[w].adj)))
+            periferico = not periferico
+            quantidade = NucleoGrafo.bfs(g, v, dist, fila=fila)
+            buscas += 1
+            if quantidade < n:
+                NucleoGrafo.limpa(dist, fila, quantidade)
+                return [inf] * n, [inf] * n
+            ecc = dist[fila[n - 1]]
+            for w in candidatos:
+                d = dist[w]
+                inferior[w] = max(inferior[w], d, ecc - d)
+                superior[w] = min(superior[w], ecc + d)
+            NucleoGrafo.limpa(dist, fila, quantidade)
+            candidatos = [w for w in candidatos if inferior[w] < superior[w]]
+        if PERFIL is not None:
+            PERFIL.conta("excentricidades.bfs", buscas)
+        return inferior, superior
+
+    """
+    Para o diâmetro, DiametroGeral() usa o iFUB (Crescenzi et al.), que se sai
+    bem mesmo em grafos aleatórios, onde a limitação de excentricidades sozinha
+    pode precisar de um BFS por vértice. Um 4-sweep (dois pares de BFS
+    "ida e volta") dá um limite inferior e um vértice central u. Os vértices
+    são então agrupados pelo nível do BFS a partir de u e processados do nível
+    mais profundo i para o mais raso, com um BFS de cada um: dois vértices nos
+    níveis menores que i estão a no máximo 2(i-1) de distância, então, quando
+    o limite inferior chega a 2(i-1), ele é o diâmetro. Os limites de
+    excentricidade de cada BFS também são guardados, e vértices cujo limite
+    superior já não passa do limite inferior do diâmetro são pulados.
+    Todo BFS passa por bfsExcentricidade, que retorna a excentricidade e o
+    último vértice visitado, e pode também preencher paiaresta (para achar o
+    caminho até ele) e niveis. Assim o 4-sweep e os níveis de u saem das
+    mesmas buscas que atualizam os limites: são 5 BFS antes dos níveis.
+    """
+
+    def bfsExcentricidade(self, v, inferior, superior, paiaresta=None, niveis=None):
+        g = self.compacta()
+        quantidade = NucleoGrafo.bfs(g, v, self.dist, paiaresta, self.fila)
+        ultimo = self.fila[quantidade - 1]
+        ecc = self.dist[ultimo] if quantidade == g.n else inf
+        if ecc != inf:
+            dist = self.dist
+            for w in range(g.n):
+                d = dist[w]
+                if max(d, ecc - d) > inferior[w]:
+                    inferior[w] = max(d, ecc - d)
+                if ecc + d < superior[w]:
+                    superior[w] = ecc + d
+            if niveis is not None:
+                for i in range(quantidade):
+                    w = self.fila[i]
+                    niveis.setdefault(dist[w], []).append(w)
+        NucleoGrafo.limpa(self.dist, self.fila, quantidade)
+        if PERFIL is not None:
+            PERFIL.conta("excentricidades.bfs")
+        return ecc, ultimo
+
+    def DiametroGeral(self):
+        g = self.compacta()
+        n = g.n
+        if n == 0:
+            return 0
+        inferior = [0] * n
+        superior = [inf] * n
+        grau = [g.inicio[v + 1] - g.inicio[v] for v in range(n)]
+        r = max(range(n), key=grau.__getitem__)
+        limite, a = self.bfsExcentricidade(r, inferior, superior)
+        if limite == inf:
+            return inf
+        pai = [-1] * n
+        for _ in range(2):
+            ecc, b = self.bfsExcentricidade(a, inferior, superior, pai)
+            limite = max(limite, ecc)
+            caminho = [b]
+            while caminho[-1] != a:
+                caminho.append(g.outro(pai[caminho[-1]], caminho[-1]))
+            r = caminho[len(caminho) // 2]
+            niveis = {}
+            ecc, a = self.bfsExcentricidade(r, inferior, superior, niveis=niveis)
+            limite = max(limite, ecc)
+        for i in range(max(niveis), 0, -1):
+            if limite >= 2 * i:
+                break
+            for w in niveis[i]:
+                if superior[w] > limite:
+                    limite = max(limite, self.bfsExcentricidade(w, inferior, superior)[0])
+            if limite >= 2 * (i - 1):
+                break
+        return limite
+
     """
     Em MSTKruskal, o primeiro passo dado é criar um set (conjunto disjunto) para cada vértice do grafo. 
     Após isso, as arestas do grafo são ordenadas em ordem não decrescente de acordo com seus pesos.
@@ -134,8 +463,105 @@ class Grafo:
                         A.append([aresta[0], aresta[1], aresta[2]])
                         Union(self.vertices[aresta[0]], self.vertices[aresta[1]])
                         qarestas += 1
+        if PERFIL is not None:
+            PERFIL.conta("kruskal.examinadas", len(self.arestas))
+            PERFIL.conta("kruskal.aceitas", len(A))
         return A
 
+    """
+    MSTFilterKruskal encontra a mesma árvore que o MSTKruskal sem ordenar todas
+    as arestas. As arestas são divididas em leves e pesadas em torno de um pivô
+    (a mediana de uma pequena amostra). As leves são tratadas primeiro,
+    recursivamente; depois, as pesadas cujos vértices já estão no mesmo set são
+    descartadas antes de serem divididas e ordenadas. Em grafos densos quase
+    todas as arestas pesadas caem nesse filtro, e assim que a árvore tem n-1
+    arestas o restante nem é examinado. Partições pequenas (até LIMIARFILTRO
+    arestas) são ordenadas e percorridas como no Kruskal comum.
+    As arestas também podem vir de um gerador. Nesse caso elas são lidas em
+    blocos de "bloco" arestas, e de cada bloco, junto com a floresta encontrada
+    até então, fica apenas a sua floresta geradora mínima: pela propriedade do
+    ciclo, nenhuma aresta descartada pode estar na MST. A memória usada fica
+    limitada a n + bloco arestas, mas o gerador precisa ser lido até o fim.
+    As arestas retornadas estão em ordem não decrescente de peso.
+    """
+
+    def MSTFilterKruskal(self, arestas=None, bloco=None):
+        if arestas is None:
+            arestas = self.arestas
+        if isinstance(arestas, list):
+            return self.florestaMinima(arestas)
+        if bloco is None:
+            bloco = max(4 * len(self.vertices), 1024)
+        arestas = iter(arestas)
+        A = []
+        while True:
+            lote = list(islice(arestas, bloco))
+            if not lote:
+                return A
+            A = self.florestaMinima(A + lote)
+
+    """
+    MSTBoruvka encontra a árvore geradora mínima pelo algoritmo de Borůvka
+    paralelo (ver boruvka abaixo). Com pesos distintos, o resultado é
+    exatamente o do MSTKruskal: as mesmas arestas, em ordem não decrescente
+    de peso.
+    """
+
+    def MSTBoruvka(self, processos=None, tamanhobloco=None):
+        exigeNumpy("MSTBoruvka")
+        m = len(self.arestas)
+        origem = np.fromiter((aresta[0] for aresta in self.arestas), np.int64, m)
+        destino = np.fromiter((aresta[1] for aresta in self.arestas), np.int64, m)
+        peso = np.fromiter((aresta[2] for aresta in self.arestas), np.float64, m)
+        escolhidas = boruvka(len(self.vertices), origem, destino, peso, processos, tamanhobloco)
+        return [list(self.arestas[e]) for e in escolhidas]
+
+    def percorreOrdenadas(self, arestas, A):
+        n = len(self.vertices)
+        aceitas = len(A)
+        examinadas = 0
+        for examinadas, aresta in enumerate(sorted(arestas, key=itemgetter(2)), 1):
+            u = self.vertices[aresta[0]]
+            v = self.vertices[aresta[1]]
+            if FindSet(u) != FindSet(v):
+                A.append([aresta[0], aresta[1], aresta[2]])
+                Union(u, v)
+                if len(A) == n - 1:
+                    break
+        if PERFIL is not None:
+            PERFIL.conta("kruskal.examinadas", examinadas)
+            PERFIL.conta("kruskal.aceitas", len(A) - aceitas)
+
+    def florestaMinima(self, arestas):
+        for v in self.vertices:
+            MakeSet(v)
+        A = []
+        self.filtroKruskal(arestas, A)
+        return A
+
+    def filtroKruskal(self, arestas, A):
+        if len(arestas) <= LIMIARFILTRO:
+            return self.percorreOrdenadas(arestas, A)
+        pesos = sorted(aresta[2] for aresta in sample(arestas, 15))
+        pivo = pesos[7]
+        leves = [aresta for aresta in arestas if aresta[2] <= pivo]
+        pesadas = [aresta for aresta in arestas if aresta[2] > pivo]
+        if not pesadas:
+            return self.percorreOrdenadas(leves, A)
+        n = len(self.vertices)
+        self.filtroKruskal(leves, A)
+        if len(A) == n - 1:
+            return
+        vertices = self.vertices
+        quantidade = len(pesadas)
+        pesadas = [aresta for aresta in pesadas
+                   if FindSet(vertices[aresta[0]]) != FindSet(vertices[aresta[1]])]
+        if PERFIL is not None:
+            PERFIL.conta("kruskal.filtradas", quantidade - len(pesadas))
+        self.filtroKruskal(pesadas, A)
+
+LIMIARFILTRO = 1000
+
 """
 As 4 funções abaixo são os procedimentos utilizados para criar sets
 (conjuntos disjuntos) para os vértices do grafo. Os sets são utilizados
@@ -163,18 +589,264 @@ def Link(u, v):
 def Union(vertice1, vertice2):
     Link(FindSet(vertice1), FindSet(vertice2))
 
+"""
+Instrumentação opcional. Enquanto nenhum Perfil está ativo (PERFIL é None),
+os procedimentos só fazem, no máximo, uma comparação fora dos laços. Com
+ativaPerfil(), o Perfil passa a acumular contadores e tempos por fase:
+- randomwalk.sorteios / randomwalk.aceitos: vértices sorteados e arestas
+  criadas no RandomTreeRandomWalk (a diferença são os sorteios rejeitados);
+- kruskal.examinadas / kruskal.aceitas / kruskal.filtradas: arestas
+  percorridas, colocadas na árvore e descartadas pelo filtro do
+  MSTFilterKruskal;
+- findset.chamadas / findset.caminho / findset.maiorcaminho: chamadas ao
+  FindSet e comprimento dos caminhos percorridos até a raiz do set;
+- bfs.expansoes: vértices retirados da fila no BFS;
+- tempo.geracao / tempo.diametro: tempo gasto gerando as árvores e
+  calculando os diâmetros.
+Para não pesar nos laços mais internos, o sorteio do RandomTreeRandomWalk
+e o FindSet são trocados por versões que contam apenas enquanto o perfil
+está ativo. relatorio() junta tudo em um dicionário e exporta() o grava
+em JSON.
+"""
+
+class Perfil:
+    def __init__(self) -> None:
+        self.contadores = {}
+        self.tempos = {}
+
+    def conta(self, nome, valor=1) -> None:
+        self.contadores[nome] = self.contadores.get(nome, 0) + valor
+
+    def maximo(self, nome, valor) -> None:
+        self.contadores[nome] = max(self.contadores.get(nome, 0), valor)
+
+    @contextmanager
+    def cronometro(self, nome):
+        inicio = time()
+        try:
+            yield
+        finally:
+            self.tempos[nome] = self.tempos.get(nome, 0.0) + time() - inicio
+
+    def relatorio(self):
+        contadores = dict(self.contadores)
+        if "randomwalk.sorteios" in contadores:
+            contadores["randomwalk.rejeitados"] = (contadores["randomwalk.sorteios"]
+                                                   - contadores.get("randomwalk.aceitos", 0))
+        if contadores.get("findset.chamadas"):
+            contadores["findset.caminhomedio"] = (contadores["findset.caminho"]
+                                                  / contadores["findset.chamadas"])
+        return {"contadores": contadores, "tempos": dict(self.tempos)}
+
+    def exporta(self, arquivo) -> None:
+        with open(arquivo, "w") as file:
+            json.dump(self.relatorio(), file, indent=2, sort_keys=True)
+
+    def __str__(self) -> str:
+        relatorio = self.relatorio()
+        res = "Perfil:\n"
+        for nome, valor in sorted(relatorio["contadores"].items()):
+            res += f"{nome}: {valor}\n"
+        for nome, valor in sorted(relatorio["tempos"].items()):
+            res += f"tempo.{nome}: {valor:f}s\n"
+        return res
+
+PERFIL = None
+sorteiaVertice = choice
+FindSetOriginal = FindSet
+
+def sorteiaVerticePerfil(vertices):
+    PERFIL.conta("randomwalk.sorteios")
+    return choice(vertices)
+
+def FindSetPerfil(v):
+    """
+    Mesma compressão de caminho do FindSet, mas iterativa: chamar o FindSet
+    original faria a recursão passar de novo pelo FindSet trocado, contando
+    cada nível do caminho como uma chamada.
+    """
+    caminho = 0
+    raiz = v
+    while raiz != raiz.pai:
+        raiz = raiz.pai
+        caminho += 1
+    while v != raiz:
+        v.pai, v = raiz, v.pai
+    PERFIL.conta("findset.chamadas")
+    PERFIL.conta("findset.caminho", caminho)
+    PERFIL.maximo("findset.maiorcaminho", caminho)
+    return raiz
+
+def ativaPerfil():
+    global PERFIL, sorteiaVertice, FindSet
+    PERFIL = Perfil()
+    sorteiaVertice = sorteiaVerticePerfil
+    FindSet = FindSetPerfil
+    return PERFIL
+
+def desativaPerfil():
+    global PERFIL, sorteiaVertice, FindSet
+    perfil = PERFIL
+    PERFIL = None
+    sorteiaVertice = choice
+    FindSet = FindSetOriginal
+    return perfil
+
+def medeTempo(nome):
+    if PERFIL is None:
+        return nullcontext()
+    return PERFIL.cronometro(nome)
+
+"""
+Borůvka paralelo para grafos esparsos grandes. A cada rodada, cada componente
+escolhe sua aresta de menor peso que sai dela, e todas as arestas escolhidas
+entram na árvore de uma vez, juntando as componentes. Com isso há no máximo
+log2(n) rodadas.
+As arestas são ordenadas uma única vez por (peso, número), e cada aresta
+passa a ser representada pela sua posição nessa ordem (posto): a menor
+aresta de saída de uma componente é a de menor posto, encontrada com
+np.minimum.at, sem ordenação nas rodadas. Empates de peso ficam desfeitos
+pelo número da aresta, o que garante que as arestas escolhidas em uma
+rodada nunca formam ciclo.
+As arestas (origem, destino, posto) e o rótulo da componente de cada vértice
+ficam em memória compartilhada (multiprocessing.shared_memory). Em cada
+rodada, as arestas são divididas em blocos, e os processos de um
+ProcessPoolExecutor calculam, cada um em seu bloco, a menor aresta de saída
+de cada componente (menoresArestas). O processo principal junta os
+resultados dos blocos, une as componentes com um union-find sobre os
+rótulos (com união por rank e path halving, para que uma estrela não vire
+uma cadeia dentro de uma rodada) e reescreve os rótulos na memória compartilhada, por pointer
+jumping, para a rodada seguinte. Depois disso, as arestas que ficaram
+dentro de uma componente são descartadas (contraídas), compactando os
+arrays compartilhados, de modo que cada rodada só percorre as arestas
+que ainda ligam componentes diferentes. Para grafos pequenos
+(menos de LIMIARPARALELO arestas) e com processos=1 tudo roda no próprio
+processo. O resultado é a lista dos números das arestas da floresta geradora
+mínima, em ordem de (peso, número).
+"""
+
+LIMIARPARALELO = 200000
+arraysBoruvka = None
+
+def menoresArestas(componente, origem, destino, posto, inicio, fim):
+    cu = componente[origem[inicio:fim]]
+    cv = componente[destino[inicio:fim]]
+    postos = posto[inicio:fim]
+    menor = np.full(len(componente), len(posto), dtype=np.int64)
+    np.minimum.at(menor, cu, postos)
+    np.minimum.at(menor, cv, postos)
+    componentes = np.flatnonzero(menor < len(posto))
+    return componentes, menor[componentes]
+
+def iniciaProcessoBoruvka(descricoes):
+    global arraysBoruvka
+    memorias = [shared_memory.SharedMemory(name=nome) for nome, _, _ in descricoes]
+    arrays = [np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+              for memoria, (_, forma, tipo) in zip(memorias, descricoes)]
+    arraysBoruvka = (memorias, arrays)
+
+def menoresArestasBloco(intervalo):
+    componente, origem, destino, posto = arraysBoruvka[1]
+    return menoresArestas(componente, origem, destino, posto, *intervalo)
+
+def compartilha(array):
+    memoria = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    copia = np.ndarray(array.shape, dtype=array.dtype, buffer=memoria.buf)
+    copia[:] = array
+    return memoria, copia
+
+def boruvka(n, origem, destino, peso, processos=None, tamanhobloco=None):
+    exigeNumpy("boruvka")
+    m = len(origem)
+    if processos is None:
+        processos = 1 if m < LIMIARPARALELO else (os.cpu_count() or 1)
+    ordem = np.lexsort((np.arange(m), np.asarray(peso, dtype=np.float64)))
+    posto = np.empty(m, dtype=np.int64)
+    posto[ordem] = np.arange(m)
+    memorias = []
+    executor = None
+    try:
+        arrays = (np.arange(n, dtype=np.int64), np.asarray(origem, dtype=np.int64),
+                  np.asarray(destino, dtype=np.int64), posto)
+        if processos > 1:
+            copias = []
+            for array in arrays:
+                memoria, copia = compartilha(array)
+                memorias.append(memoria)
+                copias.append(copia)
+            componente, origem, destino, posto = copias
+            descricoes = [(memoria.name, array.shape, array.dtype.str)
+                          for memoria, array in zip(memorias, copias)]
+            executor = ProcessPoolExecutor(processos, initializer=iniciaProcessoBoruvka,
+                                           initargs=(descricoes,))
+        else:
+            componente, origem, destino, posto = (array.copy() for array in arrays)
+        pai = list(range(n))
+        rank = [0] * n
+        escolhidas = []
+        fora = m
+        while fora > 0:
+            bloco = tamanhobloco or max(1, -(-fora // (4 * processos)))
+            blocos = [(inicio, min(fora, inicio + bloco)) for inicio in range(0, fora, bloco)]
+            if executor is not None:
+                resultados = list(executor.map(menoresArestasBloco, blocos))
+            else:
+                resultados = [menoresArestas(componente, origem, destino, posto, *bloco)
+                              for bloco in blocos]
+            menor = np.full(n, m, dtype=np.int64)
+            for componentes, postos in resultados:
+                np.minimum.at(menor, componentes, postos)
+            arestas = ordem[np.unique(menor[menor < m])]
+            for e, a, b in zip(arestas.tolist(), componente[arrays[1][arestas]].tolist(),
+                               componente[arrays[2][arestas]].tolist()):
+                while pai[a] != a:
+                    pai[a] = pai[pai[a]]
+                    a = pai[a]
+                while pai[b] != b:
+                    pai[b] = pai[pai[b]]
+                    b = pai[b]
+                if a != b:
+                    if rank[a] > rank[b]:
+                        a, b = b, a
+                    pai[a] = b
+                    if rank[a] == rank[b]:
+                        rank[b] += 1
+                    escolhidas.append(e)
+            raiz = np.array(pai, dtype=np.int64)
+            while True:
+                proximo = raiz[raiz]
+                if (proximo == raiz).all():
+                    break
+                raiz = proximo
+            pai = raiz.tolist()
+            componente[:] = raiz[componente]
+            restantes = componente[origem[:fora]] != componente[destino[:fora]]
+            for array in (origem, destino, posto):
+                array[:restantes.sum()] = array[:fora][restantes]
+            fora = int(restantes.sum())
+        escolhidas.sort(key=lambda e: (peso[e], e))
+        return escolhidas
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        for memoria in memorias:
+            memoria.close()
+            memoria.unlink()
+
 """
 O procedimento RandomTreeKruskal constrói uma árvore percorrendo um grafo completo
 com arestas de pesos inteiros aleatórios entre 0 e 1. Então, calcula a minimum
-spanning tree deste grafo com o procedimento MSTKruskal e por fim
-retorna um grafo contendo apenas as arestas encontradas no MSTKruskal.
+spanning tree deste grafo com o procedimento MSTFilterKruskal (que encontra
+a mesma árvore do MSTKruskal, mas descarta a maior parte das arestas do grafo
+completo sem ordená-las) e por fim retorna um grafo contendo apenas as arestas
+encontradas.
 """
 
 def RandomTreeKruskal(n):
-    g = Grafo(n)
+    g = Grafo(n, componentes_incremental=True)
     g.arestas = [[u, v, random()] for u in range(n) for v in range(u+1, n)]
     #print(g.arestas)
-    A = g.MSTKruskal()
+    A = g.MSTFilterKruskal()
     #print(A)
     g.arestas = []
     for aresta in A:
@@ -192,42 +864,354 @@ Caso não, ele é marcado como visitado e adiciona-se uma aresta entre o último
 verificado e ele. O procedimento é repetido enquanto a quantidade de arestas no grafo
 seja menor que o número de vértices que o grafo tem menos 1 (pré-requisito para que
 um grafo seja considerado uma árvore). 
+Como cada aresta adicionada liga a árvore a um vértice novo, o grafo pode
+ser criado no modo de diâmetro incremental (diametro_incremental=True), e o
+diâmetro já fica disponível ao final da construção. O modo não é o padrão:
+a atualização por binary lifting custa mais, por aresta, do que os dois BFS
+que ela evita.
 """
 
-def RandomTreeRandomWalk(n):
-    G = Grafo(n)
+def RandomTreeRandomWalk(n, diametro_incremental=False):
+    G = Grafo(n, diametro_incremental=diametro_incremental)
     for v in G.vertices:
         v.visitado = False
     u = choice(G.vertices)
     u.visitado = True
     while G.quantidadearestas < n - 1:
-        v = choice(G.vertices)
+        v = sorteiaVertice(G.vertices)
         if not v.visitado:
             G.addArestas(u.num, v.num, 0)
             v.visitado = True
         u = v
+    if PERFIL is not None:
+        PERFIL.conta("randomwalk.aceitos", G.quantidadearestas)
+    return G
+
+"""
+Geração de árvores em lote. Quando cada árvore gerada é reduzida logo em
+seguida a um único número, construir um Grafo com objetos Vertice para cada
+uma é desperdício. As funções random_walk_trees e kruskal_trees geram k
+árvores de n vértices de uma só vez, com sorteios vetorizados do NumPy, e
+retornam uma matriz k x n de pais: pais[i][v] é o pai do vértice v na
+i-ésima árvore, e a raiz tem pai -1. Com n = 0, a matriz é vazia (k x 0).
+
+random_walk_trees usa o fato de que, no passeio aleatório do
+RandomTreeRandomWalk, os vértices são descobertos em uma ordem uniformemente
+aleatória, e o pai do i-ésimo vértice descoberto é o (i-1)-ésimo com
+probabilidade (n-i)/n (o passo seguinte já sai da árvore) e, caso contrário,
+um dos i vértices já visitados escolhido uniformemente (o passeio vagueia
+entre eles até sair). A distribuição das árvores é a mesma do procedimento
+original.
+
+kruskal_trees constrói a MST do grafo completo com pesos aleatórios pelo
+algoritmo de Prim, que com pesos distintos encontra a mesma árvore do
+MSTKruskal. Cada aresta é examinada uma única vez, quando o primeiro de seus
+vértices entra na árvore, então seu peso pode ser sorteado nesse momento,
+sem materializar as n(n-1)/2 arestas. Com pesos=True também é retornada a
+matriz de pesos, em que pesos[i][v] é o peso da aresta (v, pais[i][v]).
+"""
+
+def random_walk_trees(n, k, seed=None):
+    exigeNumpy("random_walk_trees")
+    if n == 0:
+        return np.empty((k, 0), dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    linhas = np.arange(k)[:, None]
+    ordem = rng.permuted(np.tile(np.arange(n), (k, 1)), axis=1)
+    pais = np.empty((k, n), dtype=np.int64)
+    pais[linhas[:, 0], ordem[:, 0]] = -1
+    if n > 1:
+        i = np.arange(1, n)
+        direto = rng.random((k, n - 1)) < (n - i) / n
+        sorteado = (rng.random((k, n - 1)) * i).astype(np.int64)
+        posicaopai = np.where(direto, i - 1, sorteado)
+        pais[linhas, ordem[:, 1:]] = ordem[linhas, posicaopai]
+    return pais
+
+def kruskal_trees(n, k, seed=None, pesos=False):
+    exigeNumpy("kruskal_trees")
+    rng = np.random.default_rng(seed)
+    linhas = np.arange(k)
+    pais = np.full((k, n), -1, dtype=np.int64)
+    pesosarvore = np.zeros((k, n))
+    if n == 0:
+        return (pais, pesosarvore) if pesos else pais
+    naarvore = np.zeros((k, n), dtype=bool)
+    naarvore[:, 0] = True
+    dist = rng.random((k, n))
+    dist[:, 0] = inf
+    melhor = np.zeros((k, n), dtype=np.int64)
+    for _ in range(n - 1):
+        x = dist.argmin(axis=1)
+        pais[linhas, x] = melhor[linhas, x]
+        pesosarvore[linhas, x] = dist[linhas, x]
+        naarvore[linhas, x] = True
+        dist[linhas, x] = inf
+        w = rng.random((k, n))
+        melhora = (w < dist) & ~naarvore
+        dist = np.where(melhora, w, dist)
+        melhor = np.where(melhora, x[:, None], melhor)
+    if pesos:
+        return pais, pesosarvore
+    return pais
+
+def grafoDePais(pais, pesos=None, **opcoes):
+    """
+    Constrói um Grafo a partir de uma linha da matriz de pais.
+    """
+    G = Grafo(len(pais), **opcoes)
+    for v, p in enumerate(pais):
+        if p >= 0:
+            G.addArestas(int(p), v, 0 if pesos is None else float(pesos[v]))
     return G
 
+"""
+A classe EstatisticaOnline acumula média e variância de uma amostra pelo
+método de Welford, sem guardar os valores observados. Cada chamada de add()
+atualiza a média e a soma dos quadrados dos desvios (m2) em O(1), de forma
+numericamente estável. Com isso, a cada momento é possível saber o intervalo
+de confiança da média e decidir se vale a pena continuar amostrando.
+"""
+
+class EstatisticaOnline:
+    def __init__(self) -> None:
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+
+    def add(self, x) -> None:
+        self.n += 1
+        delta = x - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (x - self.media)
+
+    def variancia(self):
+        if self.n < 2:
+            return inf
+        return self.m2 / (self.n - 1)
+
+    def semiamplitude(self, z=1.96):
+        """
+        Metade da largura do intervalo de confiança da média
+        (z = 1.96 corresponde a 95% de confiança).
+        """
+        if self.n < 2:
+            return inf
+        return z * sqrt(self.variancia() / self.n)
+
+    def intervalo(self, z=1.96):
+        h = self.semiamplitude(z)
+        return self.media - h, self.media + h
+
+    def addLote(self, xs) -> None:
+        """
+        Acrescenta vários valores de uma vez, combinando a média e o m2
+        do lote com os acumulados (fórmula de Chan para variâncias).
+        """
+        n = len(xs)
+        if n == 0:
+            return
+        media = sum(xs) / n
+        m2 = sum((x - media) ** 2 for x in xs)
+        total = self.n + n
+        delta = media - self.media
+        self.media += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+"""
+Persistência de conjuntos de árvores. O arquivo começa com um cabeçalho
+(MAGICO e a versão do formato) e é seguido por blocos, cada um com as
+árvores de um único tamanho: um cabeçalho com n, a quantidade k de árvores
+e se há pesos, a matriz k x n de pais em int32 e, se houver, a matriz
+k x n de pesos em float64 (no formato de random_walk_trees/kruskal_trees).
+O EscritorArvores grava bloco a bloco, à medida que as árvores são geradas,
+e leArvores mapeia cada bloco na memória com np.memmap, sem carregar o
+arquivo inteiro. Assim, novas estatísticas podem ser calculadas sobre
+milhões de árvores guardadas sem gerá-las de novo.
+"""
+
+MAGICO = b"GRAFOSAR"
+VERSAO = 1
+CABECALHO = struct.Struct("<8sI")
+CABECALHOBLOCO = struct.Struct("<qqq")
+
+class EscritorArvores:
+    def __init__(self, arquivo) -> None:
+        exigeNumpy("EscritorArvores")
+        self.file = open(arquivo, "wb")
+        self.file.write(CABECALHO.pack(MAGICO, VERSAO))
+
+    def escreve(self, pais, pesos=None) -> None:
+        pais = np.ascontiguousarray(pais, dtype="<i4")
+        k, n = pais.shape
+        self.file.write(CABECALHOBLOCO.pack(n, k, pesos is not None))
+        self.file.write(pais.tobytes())
+        if pesos is not None:
+            self.file.write(np.ascontiguousarray(pesos, dtype="<f8").tobytes())
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def leArvores(arquivo):
+    """
+    Retorna a lista de blocos do arquivo como tuplas (n, pais, pesos),
+    em que pais e pesos são np.memmap somente leitura (pesos é None
+    se o bloco não tiver pesos).
+    """
+    exigeNumpy("leArvores")
+    blocos = []
+    with open(arquivo, "rb") as file:
+        magico, versao = CABECALHO.unpack(file.read(CABECALHO.size))
+        if magico != MAGICO or versao != VERSAO:
+            raise ValueError("%s não é um arquivo de árvores válido" % arquivo)
+        posicao = CABECALHO.size
+        while True:
+            dados = file.read(CABECALHOBLOCO.size)
+            if len(dados) < CABECALHOBLOCO.size:
+                break
+            n, k, tempesos = CABECALHOBLOCO.unpack(dados)
+            posicao += CABECALHOBLOCO.size
+            pais = np.memmap(arquivo, dtype="<i4", mode="r", offset=posicao, shape=(k, n))
+            posicao += 4 * k * n
+            pesos = None
+            if tempesos:
+                pesos = np.memmap(arquivo, dtype="<f8", mode="r", offset=posicao, shape=(k, n))
+                posicao += 8 * k * n
+            blocos.append((n, pais, pesos))
+            file.seek(posicao)
+    return blocos
+
+def salvaArvores(arquivo, gerador, tamanhos, k, lote=1000, seed=None, pesos=False):
+    """
+    Gera k árvores de cada tamanho com gerador (random_walk_trees ou
+    kruskal_trees), em lotes de até "lote" árvores, gravando cada
+    lote em um bloco assim que é gerado. Com pesos=True, o gerador é
+    chamado com pesos=True e deve retornar (pais, pesos), como o
+    kruskal_trees, e os pesos também são gravados.
+    """
+    exigeNumpy("salvaArvores")
+    rng = np.random.default_rng(seed)
+    with EscritorArvores(arquivo) as escritor:
+        for n in tamanhos:
+            for inicio in range(0, k, lote):
+                semente = int(rng.integers(2 ** 63))
+                if pesos:
+                    escritor.escreve(*gerador(n, min(lote, k - inicio), semente, pesos=True))
+                else:
+                    escritor.escreve(gerador(n, min(lote, k - inicio), semente))
+
+"""
+diametros calcula o diâmetro de todas as árvores de uma matriz de pais
+sem construir grafos. Primeiro a profundidade de cada vértice é obtida
+por pointer jumping (cada vértice salta para o ancestral do seu ancestral,
+O(log n) passos). Depois, com o mesmo pointer jumping, cada vértice envia a
+maior profundidade conhecida da sua subárvore ao seu ancestral 2^j níveis
+acima (np.maximum.at): após o passo j, ela cobre os descendentes a menos de
+2^(j+1) níveis, então em O(log n) passos cada vértice conhece o vértice mais
+profundo da sua subárvore, e a sua altura é a diferença das profundidades.
+Por fim, uma única ordenação dos filhos por (pai, altura) dá a segunda
+maior altura de filho de cada vértice, e o diâmetro é o maior valor da soma
+das duas maiores alturas. O custo é O(kn log n) qualquer que seja a altura
+das árvores; percorrer os níveis um a um custaria uma passada por nível,
+o que em um caminho são n passadas.
+"""
+
+def diametros(pais):
+    exigeNumpy("diametros")
+    pais = np.asarray(pais, dtype=np.int64)
+    k, n = pais.shape
+    vertices = np.arange(k * n)
+    pai = np.where(pais.ravel() < 0, -1, vertices - vertices % n + pais.ravel())
+    raizes = pai < 0
+    ancestral = np.where(raizes, vertices, pai)
+    profundidade = (~raizes).astype(np.int64)
+    for _ in range(max(1, n.bit_length())):
+        profundidade = profundidade + profundidade[ancestral]
+        profundidade[raizes] = 0
+        ancestral = ancestral[ancestral]
+    fundo = profundidade.copy()
+    ancestral = np.where(raizes, vertices, pai)
+    for _ in range(max(1, n.bit_length())):
+        np.maximum.at(fundo, ancestral, fundo.copy())
+        ancestral = ancestral[ancestral]
+    maior = fundo - profundidade
+    filhos = vertices[~raizes]
+    pai = pai[filhos]
+    altura = maior[filhos] + 1
+    ordem = np.lexsort((-altura, pai))
+    pai, altura = pai[ordem], altura[ordem]
+    segundofilho = np.zeros(len(pai), dtype=bool)
+    segundofilho[1:] = pai[1:] == pai[:-1]
+    segundofilho[2:] &= pai[2:] != pai[:-2]
+    segundo = np.zeros(k * n, dtype=np.int64)
+    segundo[pai[segundofilho]] = altura[segundofilho]
+    return (maior + segundo).reshape(k, n).max(axis=1, initial=0)
+
+def estatisticasArquivo(arquivo, funcao=diametros):
+    """
+    Percorre os blocos de um arquivo de árvores aplicando funcao
+    (por padrão, diametros) e retorna um dicionário que associa
+    cada tamanho à EstatisticaOnline dos valores obtidos.
+    """
+    estatisticas = {}
+    for n, pais, pesos in leArvores(arquivo):
+        estatisticas.setdefault(n, EstatisticaOnline()).addLote(funcao(pais).tolist())
+    return estatisticas
+
+"""
+O procedimento experimentoDiametro gera árvores com o gerador passado e
+acumula, para cada quantidade de vértices, as estatísticas dos diâmetros
+encontrados. Sem precisao, são feitas exatamente "amostras" iterações para
+todos os tamanhos, como pedido na especificação do trabalho. Com precisao,
+um tamanho deixa de ser amostrado assim que a semiamplitude do seu intervalo
+de confiança fica abaixo do valor pedido (depois de pelo menos min_amostras
+iterações), de modo que as iterações restantes são gastas apenas nos
+tamanhos cuja variância ainda exige mais amostras.
+O arquivo de saída tem uma linha por tamanho no formato
+"n média limite_inferior limite_superior amostras".
+"""
+
+def experimentoDiametro(gerador, arquivo, tamanhos=range(250, 2001, 250),
+                        amostras=500, precisao=None, min_amostras=30):
+    estatisticas = {j: EstatisticaOnline() for j in tamanhos}
+    with open(arquivo, "w") as file:
+        for i in range(amostras):
+            pendentes = [j for j in tamanhos
+                         if precisao is None or estatisticas[j].n < min_amostras
+                         or estatisticas[j].semiamplitude() > precisao]
+            if not pendentes:
+                break
+            for j in pendentes:
+                with medeTempo("geracao"):
+                    T = gerador(j)
+                with medeTempo("diametro"):
+                    estatisticas[j].add(T.Diametro())
+            print(i + 1)
+        for j in tamanhos:
+            e = estatisticas[j]
+            inferior, superior = e.intervalo()
+            file.write(f"{j} {e.media} {inferior} {superior} {e.n}\n")
+    return estatisticas
+
 """
 Como pedido na especificação do trabalho, são calculados os resultados
 dos diâmetros de árvores geradas pelo RandomTreeRandomWalk e uma média
 de todas as 500 iterações para cada quantidade de vértices (250, 500, 750,
 1000, 1250, 1500, 1750 e 2000) é feita para que os resultados sejam plottados
 e testados pelo programa plot.py passado via Classroom.
+Passando precisao, a amostragem de cada tamanho para mais cedo (ver
+experimentoDiametro).
 """
 
-def testeRTRW():
-    with open("randomwalk.txt", "w") as file:
-        soma = [0] * 9
-        for i in range(500):
-            for j in range(250, 2001, 250):
-                T = RandomTreeRandomWalk(j)
-                ind = j // 250
-                soma[ind] += T.Diametro()
-            print(i + 1)
-        for i in range(1, 9):
-            soma[i] /= 500
-            file.write(f"{i * 250} {soma[i]}\n")
+def testeRTRW(precisao=None):
+    return experimentoDiametro(RandomTreeRandomWalk, "randomwalk.txt", precisao=precisao)
 
 """
 Como pedido na especificação do trabalho, são calculados os resultados
@@ -235,21 +1219,174 @@ dos diâmetros de árvores geradas pelo RandomTreeKruskal e uma média
 de todas as 500 iterações para cada quantidade de vértices (250, 500, 750,
 1000, 1250, 1500, 1750 e 2000) é feita para que os resultados sejam plottados
 e testados pelo programa plot.py passado via Classroom.
+Passando precisao, a amostragem de cada tamanho para mais cedo (ver
+experimentoDiametro).
 """
 
-def testeRTK():
-    with open("kruskal.txt", "w") as file:
-        soma = [0] * 9
-        for i in range(500):
-            for j in range(250, 2001, 250):
-                T = RandomTreeKruskal(j)
-                ind = j // 250
-                soma[ind] += T.Diametro()
-                #print(j)
-            print(i + 1)
-        for i in range(1, 9):
-            soma[i] /= 500
-            file.write(f"{i * 250} {soma[i]}\n")
+def testeRTK(precisao=None):
+    return experimentoDiametro(RandomTreeKruskal, "kruskal.txt", precisao=precisao)
+
+"""
+Teste do modo de diâmetro incremental: para árvores geradas pelo
+RandomTreeRandomWalk, o diâmetro mantido durante a construção deve ser
+igual ao calculado pelos dois BFS. Uma aresta que fecha ciclo desliga o modo.
+"""
+
+def testeDiametroIncremental():
+    for n in [1, 2, 3, 10, 100, 500]:
+        T = RandomTreeRandomWalk(n, diametro_incremental=True)
+        assert T.diametro_incremental
+        incremental = T.Diametro()
+        T.diametro_incremental = False
+        assert incremental == T.Diametro()
+    g = Grafo(4, diametro_incremental=True)
+    g.addArestas(0, 1, 0)
+    g.addArestas(1, 2, 0)
+    g.addArestas(2, 0, 0)
+    assert not g.diametro_incremental
+    assert g.Diametro() == None
+
+"""
+Teste da cópia compacta usada pelas buscas: ela segue as listas de
+adjacências, então substituir a lista arestas (como fazem o MSTKruskal e o
+RandomTreeKruskal) não muda o grafo percorrido, e addArestas a invalida.
+"""
+
+def testeCompacta():
+    H = Grafo(4)
+    H.addArestas(0, 1, 0)
+    H.addArestas(1, 2, 0)
+    H.addArestas(2, 3, 0)
+    assert H.BFS(0) == (3, 3)
+    H.arestas = [[0, 1, 0], [0, 2, 0], [0, 3, 0]]
+    assert H.BFS(0) == (3, 3)
+    assert H.is_arvore() and H.Diametro() == 3
+    H.addArestas(3, 0, 0)
+    assert H.BFS(0) == (2, 2)
+    assert H.quantidadeComponentes() == 1 and H.conectados(0, 2)
+
+"""
+Teste do modo de componentes incremental: as consultas feitas pelo
+union-find devem concordar com as feitas pela busca em profundidade,
+e a aresta que fecha um ciclo deve ser identificada.
+"""
+
+def testeComponentesIncremental():
+    g = Grafo(6, componentes_incremental=True)
+    assert g.quantidadeComponentes() == 6
+    assert g.addArestas(0, 1, 0) == False
+    assert g.addArestas(1, 2, 0) == False
+    assert g.addArestas(3, 4, 0) == False
+    assert g.quantidadeComponentes() == 3
+    assert g.conectados(0, 2) and not g.conectados(0, 3)
+    assert g.addArestas(2, 0, 0) == True
+    assert g.quantidadeciclos == 1
+    assert g.quantidadeComponentes() == 3
+    g.componentes_incremental = False
+    assert g.quantidadeComponentes() == 3
+    assert g.conectados(0, 2) and not g.conectados(0, 3)
+    T = RandomTreeKruskal(50)
+    assert T.is_arvore() and T.is_conexo()
+    T.componentes_incremental = False
+    assert T.is_arvore()
+    h = Grafo(5, componentes_incremental=True)
+    h.addArestas(0, 1, 0)
+    h.addArestas(1, 2, 0)
+    h.addArestas(2, 0, 0)
+    h.addArestas(3, 4, 0)
+    assert h.is_arvore() == False
+    P = Grafo(100000, componentes_incremental=True)
+    for i in range(1, 100000):
+        P.addArestas(i - 1, i, 0)
+    assert P.is_arvore()
+    P.componentes_incremental = False
+    assert P.is_arvore()
+
+"""
+Teste da geração em lote: todas as linhas das matrizes devem ser árvores,
+a mesma semente deve gerar as mesmas árvores e cada aresta das árvores
+do kruskal_trees deve ter um peso em (0, 1). Com n = 0, as matrizes são
+vazias.
+"""
+
+def testeArvoresEmLote():
+    if np is None:
+        return
+    for gerador in (random_walk_trees, kruskal_trees):
+        for n in (1, 2, 50):
+            pais = gerador(n, 20, seed=7)
+            assert pais.shape == (20, n)
+            assert (pais == -1).sum() == 20
+            for linha in pais:
+                assert grafoDePais(linha, componentes_incremental=True).is_arvore()
+        assert (gerador(30, 5, seed=1) == gerador(30, 5, seed=1)).all()
+        assert gerador(0, 4).shape == (4, 0)
+        assert list(diametros(gerador(0, 4))) == [0, 0, 0, 0]
+    pais, pesos = kruskal_trees(40, 3, seed=3, pesos=True)
+    assert (pais == kruskal_trees(40, 3, seed=3)).all()
+    assert ((pesos > 0) == (pais >= 0)).all() and (pesos < 1).all()
+
+"""
+Teste da persistência: as árvores relidas do arquivo devem ser as mesmas
+gravadas, e os diâmetros calculados sobre a matriz de pais devem ser iguais
+aos calculados pelos BFS do Grafo, inclusive em caminhos. Com pesos=True, o
+salvaArvores deve gravar os pesos mesmo com um gerador embrulhado.
+"""
+
+def testeArquivoArvores(arquivo="arvores_teste.bin"):
+    if np is None:
+        return
+    pais = random_walk_trees(60, 10, seed=5)
+    paisk, pesosk = kruskal_trees(30, 4, seed=5, pesos=True)
+    with EscritorArvores(arquivo) as escritor:
+        escritor.escreve(pais)
+        escritor.escreve(paisk, pesosk)
+    blocos = leArvores(arquivo)
+    assert [b[0] for b in blocos] == [60, 30]
+    assert (blocos[0][1] == pais).all() and blocos[0][2] is None
+    assert (blocos[1][1] == paisk).all() and (blocos[1][2] == pesosk).all()
+    for n, P, _ in blocos:
+        assert list(diametros(P)) == [grafoDePais(linha).Diametro() for linha in P]
+    caminhos = np.array([np.arange(-1, 2999), np.arange(1, 3001)])
+    caminhos[1, -1] = -1
+    assert list(diametros(caminhos)) == [2999, 2999]
+    del blocos, P
+    salvaArvores(arquivo, lambda n, k, seed, pesos: kruskal_trees(n, k, seed, pesos),
+                 [15], 12, lote=5, seed=2, pesos=True)
+    blocos = leArvores(arquivo)
+    assert [len(b[1]) for b in blocos] == [5, 5, 2]
+    assert all(b[2] is not None and ((b[2] > 0) == (b[1] >= 0)).all() for b in blocos)
+    del blocos
+    salvaArvores(arquivo, random_walk_trees, [20, 40], 25, lote=10, seed=1)
+    estatisticas = estatisticasArquivo(arquivo)
+    assert estatisticas[20].n == 25 and estatisticas[40].n == 25
+    os.remove(arquivo)
+
+"""
+Teste da EstatisticaOnline: a média e a variância calculadas de forma
+incremental devem ser iguais às calculadas diretamente sobre a amostra.
+"""
+
+def testeEstatisticaOnline():
+    amostra = [2, 4, 4, 4, 5, 5, 7, 9]
+    e = EstatisticaOnline()
+    for x in amostra:
+        e.add(x)
+    media = sum(amostra) / len(amostra)
+    variancia = sum((x - media) ** 2 for x in amostra) / (len(amostra) - 1)
+    assert e.n == 8
+    assert abs(e.media - media) < 1e-12
+    assert abs(e.variancia() - variancia) < 1e-12
+    inferior, superior = e.intervalo()
+    assert inferior < media < superior
+    lote = EstatisticaOnline()
+    lote.add(amostra[0])
+    lote.addLote(amostra[1:5])
+    lote.addLote(amostra[5:])
+    assert lote.n == 8
+    assert abs(lote.media - media) < 1e-12
+    assert abs(lote.variancia() - variancia) < 1e-12
+    assert EstatisticaOnline().semiamplitude() == inf
 
 """
 As funções abaixo foram feitas pra calcular o tempo puro dos procedimentos,
@@ -260,13 +1397,16 @@ os diâmetros e as médias
 def RTK():
     for i in range(1):
         for j in range(250, 2001, 250):
-            T = RandomTreeKruskal(j)
-            print(T.Diametro())
+            with medeTempo("geracao"):
+                T = RandomTreeKruskal(j)
+            with medeTempo("diametro"):
+                print(T.Diametro())
 
 def RTRW():
     for i in range(1):
         for j in range(250, 2001, 250):
-            T = RandomTreeRandomWalk(j)
+            with medeTempo("geracao"):
+                T = RandomTreeRandomWalk(j)
             #print(T.Diametro())
 
 def Parte1():
@@ -331,18 +1471,195 @@ def testeMSTKruskal():
     assert F.is_arvore() == True
     assert pesototaldografo == 2
 
+"""
+Teste do MSTFilterKruskal: para os grafos do teste anterior e para grafos
+completos com pesos aleatórios (inclusive com pesos repetidos), a árvore
+encontrada deve ser a mesma do MSTKruskal, tanto com as arestas em uma lista
+quanto vindas de um gerador lido em blocos pequenos.
+"""
+
+def testeMSTFilterKruskal():
+    G = Grafo(5)
+    G.arestas = [[0, 1, 0.5], [1, 2, 1], [0, 2, 0.1], [3, 1, 0.4], [4, 2, 1], [4, 3, 1]]
+    assert G.MSTFilterKruskal() == [[0, 2, 0.1], [3, 1, 0.4], [0, 1, 0.5], [4, 2, 1]]
+    for n, pesos in [(60, random), (60, lambda: choice([0, 1, 2])), (5, random)]:
+        G = Grafo(n)
+        G.arestas = [[u, v, pesos()] for u in range(n) for v in range(u+1, n)]
+        A = G.MSTFilterKruskal()
+        B = G.MSTFilterKruskal((aresta for aresta in G.arestas), bloco=n)
+        assert A == B == G.MSTKruskal()
+
+"""
+Teste da instrumentação: com o perfil ativo os contadores devem bater com
+o que se sabe dos procedimentos, e depois de desativado nada mais é contado.
+"""
+
+def testePerfil(arquivo="perfil_teste.json"):
+    perfil = ativaPerfil()
+    try:
+        T = RandomTreeRandomWalk(100)
+        with medeTempo("diametro"):
+            T.Diametro()
+        G = Grafo(5)
+        G.arestas = [[0, 1, 0.5], [1, 2, 1], [0, 2, 0.1], [3, 1, 0.4], [4, 2, 1], [4, 3, 1]]
+        G.MSTKruskal()
+    finally:
+        desativaPerfil()
+    relatorio = perfil.relatorio()
+    contadores = relatorio["contadores"]
+    assert contadores["randomwalk.aceitos"] == 99
+    assert contadores["randomwalk.sorteios"] == 99 + contadores["randomwalk.rejeitados"]
+    assert contadores["bfs.expansoes"] == 200
+    assert contadores["kruskal.examinadas"] == 6
+    assert contadores["kruskal.aceitas"] == 4
+    assert contadores["findset.chamadas"] > 0
+    cadeia = [Vertice(i) for i in range(4)]
+    for v in cadeia:
+        MakeSet(v)
+    for filho, pai in zip(cadeia, cadeia[1:]):
+        filho.pai = pai
+    perfilcadeia = ativaPerfil()
+    try:
+        assert FindSet(cadeia[0]) is cadeia[3]
+    finally:
+        desativaPerfil()
+    assert perfilcadeia.contadores["findset.chamadas"] == 1
+    assert perfilcadeia.contadores["findset.caminho"] == 3
+    assert perfilcadeia.contadores["findset.maiorcaminho"] == 3
+    assert all(v.pai is cadeia[3] for v in cadeia)
+    assert FindSet is FindSetOriginal
+    assert "diametro" in relatorio["tempos"]
+    RandomTreeRandomWalk(50)
+    assert perfil.contadores["randomwalk.aceitos"] == 99
+    perfil.exporta(arquivo)
+    with open(arquivo) as file:
+        assert json.load(file) == json.loads(json.dumps(relatorio))
+    os.remove(arquivo)
+
+"""
+Teste do MSTBoruvka: com pesos distintos, o resultado deve ser idêntico ao
+do MSTKruskal, tanto no próprio processo quanto com os blocos distribuídos
+entre processos. Em um grafo desconexo, deve ser encontrada a floresta.
+Sem o NumPy, MSTBoruvka deve levantar ImportError.
+"""
+
+def testeMSTBoruvka():
+    global np
+    if np is None:
+        return
+    F = Grafo(6)
+    F.arestas = [[0, 1, 1], [1, 2, 0.3], [0, 2, 0.1], [3, 1, 1.5], [4, 2, 0.7], [4, 3, 0.5], [5, 0, 1.2], [5, 2, 0.4]]
+    assert F.MSTBoruvka() == F.MSTKruskal()
+    for n in (2, 30, 200):
+        G = Grafo(n)
+        G.arestas = [[u, v, random()] for u in range(n) for v in range(u+1, n) if random() < 0.3]
+        G.arestas += [[u - 1, u, random()] for u in range(1, n)]
+        A = G.MSTBoruvka()
+        assert A == G.MSTBoruvka(processos=2, tamanhobloco=97)
+        assert A == G.MSTKruskal()
+    H = Grafo(5)
+    H.arestas = [[0, 1, 0.3], [1, 2, 0.2], [0, 2, 0.1], [3, 4, 0.5]]
+    assert H.MSTBoruvka(processos=2, tamanhobloco=1) == [[0, 2, 0.1], [1, 2, 0.2], [3, 4, 0.5]]
+    n = 200000
+    peso = np.random.default_rng(0).permutation(n - 1) / n
+    for origem, destino in [(np.zeros(n - 1, dtype=np.int64), np.arange(1, n)),
+                            (np.arange(1, n), np.zeros(n - 1, dtype=np.int64))]:
+        escolhidas = boruvka(n, origem, destino, peso, processos=1)
+        assert sorted(escolhidas) == list(range(n - 1))
+    numpy, np = np, None
+    try:
+        F.MSTBoruvka()
+        assert False
+    except ImportError:
+        pass
+    finally:
+        np = numpy
+
+"""
+Teste do diâmetro e das excentricidades de grafos quaisquer: os resultados
+devem ser iguais aos obtidos com um BFS a partir de cada vértice, em
+árvores, em grafos com ciclos (como o grafo h da Parte 1) e em grafos
+desconexos. Com limite de buscas, os limites devem conter as
+excentricidades exatas.
+"""
+
+def testeDiametroGeral():
+    def excentricidades(G):
+        res = []
+        for v in range(len(G.vertices)):
+            dist = NucleoGrafo.buffer(len(G.vertices))
+            quantidade = NucleoGrafo.bfs(G.compacta(), v, dist)
+            res.append(max(dist) if quantidade == len(G.vertices) else inf)
+        return res
+    h = Grafo(7)
+    for u, v in [(0, 1), (0, 5), (1, 3), (5, 2), (5, 6), (1, 4), (6, 4)]:
+        h.addArestas(u, v, 0)
+    assert h.Diametro() == None
+    assert h.DiametroGeral() == 4
+    grafos = [h, RandomTreeRandomWalk(80), Grafo(1)]
+    for n, p in [(60, 0.05), (60, 0.1), (200, 0.02), (30, 0.03)]:
+        G = Grafo(n)
+        for u in range(n):
+            for v in range(u+1, n):
+                if random() < p:
+                    G.addArestas(u, v, 0)
+        grafos.append(G)
+    for G in grafos:
+        exatas = excentricidades(G)
+        assert G.DiametroGeral() == max(exatas)
+        inferior, superior = G.Excentricidades()
+        assert inferior == superior == exatas
+        inferior, superior = G.Excentricidades(maximobfs=2)
+        assert all(i <= e <= s for i, e, s in zip(inferior, exatas, superior))
+    caminho = Grafo(1000)
+    for v in range(999):
+        caminho.addArestas(v, v+1, 0)
+    chamadas = [0]
+    bfsoriginal = NucleoGrafo.bfs
+    def bfsContada(*args, **kwargs):
+        chamadas[0] += 1
+        return bfsoriginal(*args, **kwargs)
+    ativo = PERFIL is not None
+    perfil = PERFIL if ativo else ativaPerfil()
+    antes = perfil.contadores.get("excentricidades.bfs", 0)
+    NucleoGrafo.bfs = bfsContada
+    try:
+        assert caminho.DiametroGeral() == 999
+    finally:
+        NucleoGrafo.bfs = bfsoriginal
+        if not ativo:
+            desativaPerfil()
+    assert perfil.contadores["excentricidades.bfs"] - antes == chamadas[0] == 5
+
 
-def main():
+def main(perfilar=False):
+    testePerfil()
+    if perfilar:
+        ativaPerfil()
     t1 = time()
     Parte1()
     RTRW() #Parte 2
     RTK() #Parte 3
     testeMSTKruskal()
+    testeMSTFilterKruskal()
+    testeMSTBoruvka()
+    testeDiametroGeral()
+    testeEstatisticaOnline()
+    testeDiametroIncremental()
+    testeComponentesIncremental()
+    testeCompacta()
+    testeArvoresEmLote()
+    testeArquivoArvores()
+    NucleoGrafo.testeNucleo()
     #testeRTRW()
     #testeRTK()
     t2 = time()
     ttotal = t2 - t1
     print("O tempo total de execução foi %f" % ttotal)
+    if perfilar:
+        perfil = desativaPerfil()
+        print(perfil)
+        perfil.exporta("perfil.json")
 
 if __name__ == '__main__':
-    main()
+    main("--perfil" in sys.argv)